@@ -1,16 +1,24 @@
 """Main Flask application for WizardLightYearsCalculator API."""
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request
+from flask.json.provider import JSONProvider
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from typing import Tuple, Dict, Any
+from functools import lru_cache
+from typing import Tuple, Dict, Any, Iterable, List, Optional, Union
 import logging
+import time
+import numpy as np
+import orjson
 from database import Database
+from rate_limiter import limit_per_client
 from esi_client import ESIClient
-from calculator import calculate_distance
+from calculator import calculate_distance, calculate_distances_bulk
 from config import (
     MIN_SYSTEM_ID, MAX_SYSTEM_ID, API_HOST, API_PORT, DEBUG,
-    RATE_LIMIT_ENABLED, RATE_LIMIT_PER_MINUTE, RATE_LIMIT_PER_HOUR
+    RATE_LIMIT_ENABLED, RATE_LIMIT_PER_MINUTE, RATE_LIMIT_PER_HOUR,
+    MAX_BATCH_PAIRS, SYSTEM_CACHE_SIZE, SYSTEM_REFRESH_SECONDS, SYSTEM_RETRY_SECONDS,
+    MAX_ESI_FETCHES_PER_REQUEST
 )
 
 # Configure logging
@@ -20,9 +28,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+class ORJSONProvider(JSONProvider):
+    """JSON provider backed by orjson, so request bodies are parsed with it too."""
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serialize data to a JSON string."""
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        """Deserialize a JSON string or bytes."""
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+app.config["RATE_LIMIT_ENABLED"] = RATE_LIMIT_ENABLED
 
-# Initialize rate limiter
+# Initialize rate limiter for the hourly cap on routes without their own
+# limits; the distance routes are exempt and enforce both their per-minute
+# and hourly limits with the lighter in-process token buckets in rate_limiter
 limiter = Limiter(
     get_remote_address,
     app=app,
@@ -35,81 +60,391 @@ db = Database()
 esi = ESIClient()
 
 
-def validate_system_id(system_id: int) -> Tuple[bool, str]:
+class TooManyESIFetchesError(ValueError):
+    """Raised when a request needs more systems from ESI than one request may fetch."""
+
+
+def json_response(data: Any, status: int = 200) -> Response:
+    """
+    Serialize data to a JSON response with orjson.
+    
+    Args:
+        data: JSON-serializable data; NumPy arrays and scalars are supported
+        status: HTTP status code
+        
+    Returns:
+        Flask response with an application/json body
+    """
+    return app.response_class(
+        orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY),
+        status=status,
+        mimetype="application/json"
+    )
+
+
+def validate_system_id(system_id: int,
+                       _min: int = MIN_SYSTEM_ID,
+                       _max: int = MAX_SYSTEM_ID,
+                       _range_error: str = f"System ID must be between {MIN_SYSTEM_ID:,} and {MAX_SYSTEM_ID:,}"
+                       ) -> Tuple[bool, str]:
     """
     Validate that a system ID is within the acceptable range.
     
+    The bounds and error message are bound as defaults when the function is
+    defined, so the common valid case is two local comparisons.
+    
     Args:
         system_id: The system ID to validate
         
     Returns:
         Tuple of (is_valid, error_message)
     """
+    if type(system_id) is int and _min <= system_id <= _max:
+        return True, ""
+    
     if not isinstance(system_id, int):
         return False, "System ID must be an integer"
     
-    if system_id < MIN_SYSTEM_ID or system_id > MAX_SYSTEM_ID:
-        return False, f"System ID must be between {MIN_SYSTEM_ID:,} and {MAX_SYSTEM_ID:,}"
-    
-    return True, ""
+    return False, _range_error
 
 
 def get_or_fetch_system(system_id: int) -> Dict[str, Any]:
     """
-    Get system data from database or fetch from ESI if not present.
+    Get system data from cache or database, fetching from ESI if not present.
+    
+    Results are kept in an in-process LRU cache so repeat lookups don't touch
+    SQLite; an entry whose stored data has become older than
+    SYSTEM_REFRESH_SECONDS is looked up again so the system is revalidated.
+    The returned dictionary is shared between callers and must not be
+    modified.
     
     Args:
         system_id: The EVE Online system ID
         
     Returns:
-        Dictionary with system information
+        Dictionary with system_id, name, x, y and z
         
     Raises:
         ValueError: If system not found
         RuntimeError: If ESI API fails
     """
-    # Check database first
-    system_data = db.get_system(system_id)
+    system, last_update = _cached_system(system_id)
+    if last_update < int(time.time()) - SYSTEM_REFRESH_SECONDS:
+        # The entry was cached before the system went stale. A miss never
+        # returns a stale entry (a failed revalidation defers the next one),
+        # so this looks the system up, and revalidates it, only once.
+        # lru_cache can't drop a single entry, but this happens at most once
+        # per system per refresh period.
+        _cached_system.cache_clear()
+        system, _ = _cached_system(system_id)
+    return system
+
+
+@lru_cache(maxsize=SYSTEM_CACHE_SIZE)
+def _cached_system(system_id: int) -> Tuple[Dict[str, Any], int]:
+    """Look up a system and its last_update on a cache miss; see get_or_fetch_system."""
+    # Check the in-memory index first
+    system_data = db.index.get(system_id)
+    
+    if system_data is None:
+        # Another worker may have stored it since the index was loaded
+        system_data = db.get_system(system_id)
+        if system_data:
+            db.index.add([system_data])
     
     if system_data:
-        # Update last_update timestamp
-        db.update_system_timestamp(system_id)
-        return system_data
-    
-    # Fetch from ESI API
-    esi_data = esi.get_system_info(system_id)
-    
-    # Store in database
-    db.insert_system(
-        system_id=esi_data["system_id"],
-        name=esi_data["name"],
-        x=esi_data["x"],
-        y=esi_data["y"],
-        z=esi_data["z"]
-    )
+        system_data = refresh_stale_systems({system_id: system_data})[system_id]
+    else:
+        # Fetch from ESI API
+        esi_data = esi.get_system_info(system_id)
+        
+        # Store in database
+        system_data = db.insert_system(
+            system_id=esi_data["system_id"],
+            name=esi_data["name"],
+            x=esi_data["x"],
+            y=esi_data["y"],
+            z=esi_data["z"],
+            etag=esi_data.get("etag")
+        )
     
-    # Fetch complete record with timestamps
-    db_record = db.get_system(system_id)
-    if db_record is None:
-        raise RuntimeError(f"Failed to retrieve system {system_id} after inserting")
-    return db_record
+    # Only last_update is kept beside the fields needed to calculate distances
+    return {
+        "system_id": system_data["system_id"],
+        "name": system_data["name"],
+        "x": system_data["x"],
+        "y": system_data["y"],
+        "z": system_data["z"]
+    }, system_data["last_update"]
+
+
+def get_or_fetch_systems(system_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Get several systems from the database, fetching any missing ones from ESI.
+    
+    Systems are resolved from the in-memory index, then with a single batched
+    query for any stored since the index was loaded; missing systems are
+    fetched from ESI concurrently and stored with a single batched insert.
+    
+    Args:
+        system_ids: The EVE Online system IDs
+        
+    Returns:
+        Dictionary mapping system ID to system information
+        
+    Raises:
+        TooManyESIFetchesError: If more than MAX_ESI_FETCHES_PER_REQUEST
+            systems would have to be fetched from ESI
+        ValueError: If any system is not found
+        RuntimeError: If ESI API fails
+    """
+    ids = list(dict.fromkeys(system_ids))
+    systems = db.index.get_many(ids)
+    
+    missing = [system_id for system_id in ids if system_id not in systems]
+    if missing:
+        stored = db.get_systems(missing)
+        db.index.add(stored.values())
+        systems.update(stored)
+        missing = [system_id for system_id in missing if system_id not in systems]
+    
+    if len(missing) > MAX_ESI_FETCHES_PER_REQUEST:
+        raise TooManyESIFetchesError(
+            f"{len(missing)} systems are not stored yet; at most "
+            f"{MAX_ESI_FETCHES_PER_REQUEST} can be fetched per request"
+        )
+    
+    systems = refresh_stale_systems(systems)
+    
+    if missing:
+        fetched = esi.get_systems_info(missing)
+        db.insert_systems(fetched)
+        for esi_data in fetched:
+            systems[esi_data["system_id"]] = esi_data
+    
+    return systems
+
+
+def refresh_stale_systems(systems: Dict[int, Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """
+    Revalidate systems whose stored data is older than SYSTEM_REFRESH_SECONDS.
+    
+    ESI is sent each system's stored ETag, so an unchanged system costs a 304
+    response with no body. A system that can't be revalidated keeps its stored
+    data and isn't tried again for SYSTEM_RETRY_SECONDS. At most
+    MAX_ESI_FETCHES_PER_REQUEST systems are revalidated per call.
+    
+    Args:
+        systems: Dictionary mapping system ID to stored system information,
+            including last_update
+        
+    Returns:
+        Dictionary mapping system ID to current system information
+    """
+    cutoff = int(time.time()) - SYSTEM_REFRESH_SECONDS
+    stale = [system_id for system_id, system in systems.items() if system["last_update"] < cutoff]
+    # Any left over keep their stored data and are revalidated by a later request
+    stale = stale[:MAX_ESI_FETCHES_PER_REQUEST]
+    if not stale:
+        return systems
+    
+    etags = {
+        system_id: row["etag"]
+        for system_id, row in db.get_systems(stale).items()
+        if row["etag"]
+    }
+    
+    # Each system's outcome is kept, so one failure doesn't discard the rest
+    results = esi.get_systems_info(stale, etags, return_exceptions=True)
+    changed, unchanged, failed = [], [], []
+    for system_id, result in zip(stale, results):
+        if isinstance(result, Exception):
+            failed.append(system_id)
+        elif result is None:
+            unchanged.append(system_id)
+        else:
+            changed.append(result)
+    
+    refreshed = dict(systems)
+    for system in db.refresh_systems(changed, unchanged):
+        refreshed[system["system_id"]] = system
+    
+    if failed:
+        first_error = next(result for result in results if isinstance(result, Exception))
+        logger.warning(
+            f"Failed to revalidate {len(failed)} stale systems, retrying in "
+            f"{SYSTEM_RETRY_SECONDS}s: {type(first_error).__name__}: {str(first_error)}"
+        )
+        # Back-date last_update so these come due again after SYSTEM_RETRY_SECONDS
+        # rather than sending every later request to ESI
+        retry_after = int(time.time()) - SYSTEM_REFRESH_SECONDS + SYSTEM_RETRY_SECONDS
+        for system in db.set_last_update(failed, retry_after):
+            refreshed[system["system_id"]] = system
+    
+    return refreshed
+
+
+def parse_batch_pairs(data: Any) -> Tuple[Optional[List[Tuple[int, int]]], str]:
+    """
+    Parse and validate the system ID pairs of a batch distance request.
+    
+    Accepts either ``{"pairs": [[id1, id2], ...]}`` or
+    ``{"origin": id, "targets": [id, ...]}``. The batch size is checked
+    before any pair is inspected.
+    
+    Args:
+        data: The decoded JSON request body
+        
+    Returns:
+        Tuple of (pairs, error_message); pairs is None if validation failed
+    """
+    if not isinstance(data, dict):
+        return None, "Request body must be a JSON object"
+    
+    if "pairs" in data:
+        raw_pairs = data["pairs"]
+        shape_error = "pairs must be a list of [system_id_1, system_id_2] lists"
+        labels = ("pairs[{i}][0]", "pairs[{i}][1]")
+    elif "origin" in data and "targets" in data:
+        raw_pairs = data["targets"]
+        shape_error = "targets must be a list of system IDs"
+        labels = ("origin", "targets[{i}]")
+    else:
+        return None, "Either pairs or origin and targets are required"
+    
+    if not isinstance(raw_pairs, list):
+        return None, shape_error
+    if not raw_pairs:
+        return None, "At least one pair is required"
+    if len(raw_pairs) > MAX_BATCH_PAIRS:
+        return None, f"A batch may contain at most {MAX_BATCH_PAIRS:,} pairs"
+    
+    if "pairs" not in data:
+        raw_pairs = [[data["origin"], target] for target in raw_pairs]
+    elif not all(isinstance(pair, list) and len(pair) == 2 for pair in raw_pairs):
+        return None, shape_error
+    
+    return parse_system_id_pairs(raw_pairs, labels)
+
+
+def parse_system_id_pairs(raw_pairs: List[List[Any]],
+                          labels: Tuple[str, str]) -> Tuple[Optional[List[Tuple[int, int]]], str]:
+    """
+    Convert the values of a batch request to validated system ID pairs.
+    
+    Args:
+        raw_pairs: Two-item lists of system ID values from the request body
+        labels: Format strings naming each item of pair ``i`` in errors
+        
+    Returns:
+        Tuple of (pairs, error_message); pairs is None if validation failed
+    """
+    pairs = []
+    for i, raw_pair in enumerate(raw_pairs):
+        pair = []
+        for label, value in zip(labels, raw_pair):
+            try:
+                system_id = int(value)
+            except (ValueError, TypeError):
+                return None, f"{label.format(i=i)}: System IDs must be valid integers"
+            
+            is_valid, error_msg = validate_system_id(system_id)
+            if not is_valid:
+                # Labels are only formatted for the pair that failed
+                return None, f"{label.format(i=i)}: {error_msg}"
+            pair.append(system_id)
+        pairs.append((pair[0], pair[1]))
+    
+    return pairs, ""
+
+
+def build_distance_response(system1: Dict[str, Any], system2: Dict[str, Any],
+                            distance_meters: float, distance_lightyears: float) -> Dict[str, Any]:
+    """
+    Build the response body for the distance between two systems.
+    
+    Args:
+        system1: First system information
+        system2: Second system information
+        distance_meters: Distance between the systems in meters
+        distance_lightyears: Distance between the systems in light-years
+        
+    Returns:
+        Dictionary with both systems' IDs and names and the distance
+    """
+    return {
+        "system_1": {
+            "system_id": system1["system_id"],
+            "name": system1["name"]
+        },
+        "system_2": {
+            "system_id": system2["system_id"],
+            "name": system2["name"]
+        },
+        "distance_meters": distance_meters,
+        "distance_lightyears": distance_lightyears
+    }
+
+
+def lookup_error_response(error: Exception, endpoint: str):
+    """
+    Convert an exception raised while looking up systems into an error response.
+    
+    Error messages are sanitized so no internal or ESI details are exposed.
+    
+    Args:
+        error: The exception that was raised
+        endpoint: Name of the endpoint, used for logging
+        
+    Returns:
+        Tuple of (JSON response, HTTP status code)
+    """
+    error_str = str(error)
+    
+    if isinstance(error, TooManyESIFetchesError):
+        logger.warning(f"Batch rejected: {error_str}")
+        return json_response({"error": error_str}, 400)
+    
+    if isinstance(error, ValueError):
+        if "not found" in error_str.lower():
+            logger.warning(f"System not found: {error_str}")
+            return json_response({"error": "One or more system IDs not found in EVE Online universe"}, 404)
+        logger.error(f"ValueError in distance calculation: {error_str}")
+        return json_response({"error": "Invalid system data"}, 400)
+    
+    if isinstance(error, RuntimeError):
+        logger.error(f"RuntimeError: {error_str}")
+        if "ESI" in error_str or "fetch" in error_str.lower():
+            return json_response({"error": "Unable to retrieve system information. Please try again later."}, 502)
+        return json_response({"error": "A service error occurred"}, 500)
+    
+    # Log detailed error but return generic message
+    logger.error(f"Unexpected error in {endpoint}: {type(error).__name__}: {error_str}", exc_info=error)
+    return json_response({"error": "An unexpected error occurred"}, 500)
+
+
+# The API information never changes, so serialize it once at startup
+INDEX_BODY = orjson.dumps({
+    "api": "WizardLightYearsCalculator",
+    "version": "1.0.0",
+    "description": "Calculate distances between EVE Online solar systems",
+    "endpoints": {
+        "/calculate-distance": "POST with system_id_1 and system_id_2",
+        "/calculate-distances": "POST with pairs, or origin and targets"
+    }
+})
 
 
 @app.route("/", methods=["GET"])
 def index():
     """API information endpoint."""
-    return jsonify({
-        "api": "WizardLightYearsCalculator",
-        "version": "1.0.0",
-        "description": "Calculate distances between EVE Online solar systems",
-        "endpoints": {
-            "/calculate-distance": "POST with system_id_1 and system_id_2"
-        }
-    })
+    # A fresh Response per request; after_request hooks may modify headers
+    return app.response_class(INDEX_BODY, mimetype="application/json")
 
 
 @app.route("/calculate-distance", methods=["POST", "GET"])
-@limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
+@limiter.exempt
+@limit_per_client(int(RATE_LIMIT_PER_MINUTE), int(RATE_LIMIT_PER_HOUR))
 def calculate_distance_endpoint():
     """
     Calculate distance between two EVE Online systems.
@@ -132,97 +467,123 @@ def calculate_distance_endpoint():
     
     # Validate parameters are provided
     if system_id_1 is None or system_id_2 is None:
-        return jsonify({
+        return json_response({
             "error": "Both system_id_1 and system_id_2 are required"
-        }), 400
+        }, 400)
     
     # Convert to integers if needed
     try:
         system_id_1 = int(system_id_1)
         system_id_2 = int(system_id_2)
     except (ValueError, TypeError):
-        return jsonify({
+        return json_response({
             "error": "System IDs must be valid integers"
-        }), 400
-    
-    # Validate system_id_1
-    is_valid, error_msg = validate_system_id(system_id_1)
-    if not is_valid:
-        return jsonify({"error": f"system_id_1: {error_msg}"}), 400
+        }, 400)
     
-    # Validate system_id_2
-    is_valid, error_msg = validate_system_id(system_id_2)
-    if not is_valid:
-        return jsonify({"error": f"system_id_2: {error_msg}"}), 400
+    # Validate both system IDs
+    for field, system_id in (("system_id_1", system_id_1), ("system_id_2", system_id_2)):
+        is_valid, error_msg = validate_system_id(system_id)
+        if not is_valid:
+            return json_response({"error": f"{field}: {error_msg}"}, 400)
     
     try:
-        # Get or fetch both systems
         system1 = get_or_fetch_system(system_id_1)
+        
+        # A system is zero distance from itself; skip the second lookup
+        if system_id_1 == system_id_2:
+            return json_response(build_distance_response(system1, system1, 0.0, 0.0), 200)
+        
         system2 = get_or_fetch_system(system_id_2)
         
         # Calculate distance
         distance = calculate_distance(system1, system2)
         
-        # Build response
-        response = {
-            "system_1": {
-                "system_id": system1["system_id"],
-                "name": system1["name"]
-            },
-            "system_2": {
-                "system_id": system2["system_id"],
-                "name": system2["name"]
-            },
-            "distance_meters": distance["distance_meters"],
-            "distance_lightyears": distance["distance_lightyears"]
-        }
-        
-        return jsonify(response), 200
-        
-    except ValueError as e:
-        # Sanitize error message - only expose user-friendly info
-        error_str = str(e)
-        if "not found" in error_str.lower():
-            logger.warning(f"System not found: {error_str}")
-            return jsonify({"error": "One or more system IDs not found in EVE Online universe"}), 404
-        logger.error(f"ValueError in distance calculation: {error_str}")
-        return jsonify({"error": "Invalid system data"}), 400
+        return json_response(build_distance_response(
+            system1, system2,
+            distance["distance_meters"], distance["distance_lightyears"]
+        ), 200)
         
-    except RuntimeError as e:
-        # Sanitize runtime errors - don't expose API details
-        error_str = str(e)
-        logger.error(f"RuntimeError: {error_str}")
-        if "ESI" in error_str or "fetch" in error_str.lower():
-            return jsonify({"error": "Unable to retrieve system information. Please try again later."}), 502
-        return jsonify({"error": "A service error occurred"}), 500
+    except Exception as e:
+        return lookup_error_response(e, "calculate_distance")
+
+
+@app.route("/calculate-distances", methods=["POST"])
+@limiter.exempt
+@limit_per_client(int(RATE_LIMIT_PER_MINUTE), int(RATE_LIMIT_PER_HOUR))
+def calculate_distances_batch():
+    """
+    Calculate distances for many pairs of EVE Online systems in one request.
+    
+    Request Body (JSON), either:
+        pairs: List of [system_id_1, system_id_2] lists
+    or:
+        origin: System ID to measure from
+        targets: List of system IDs to measure to
+        
+    Returns:
+        JSON array with one distance result per pair, in request order
+    """
+    if not request.is_json:
+        return json_response({"error": "Request body must be JSON"}, 400)
+    
+    pairs, error_msg = parse_batch_pairs(request.get_json())
+    if pairs is None:
+        return json_response({"error": error_msg}, 400)
+    
+    try:
+        systems = get_or_fetch_systems(
+            system_id for pair in pairs for system_id in pair
+        )
+        
+        # Calculate all distances in one vectorized pass; a shared origin
+        # (e.g. an origin/targets request) is broadcast instead of repeated
+        origin_ids = {system_id for system_id, _ in pairs}
+        if len(origin_ids) == 1:
+            origin = systems[origin_ids.pop()]
+            origins_xyz = np.array([origin["x"], origin["y"], origin["z"]], dtype=np.float64)
+        else:
+            origins_xyz = np.array(
+                [[systems[s]["x"], systems[s]["y"], systems[s]["z"]] for s, _ in pairs],
+                dtype=np.float64
+            )
+        targets_xyz = np.array(
+            [[systems[s]["x"], systems[s]["y"], systems[s]["z"]] for _, s in pairs],
+            dtype=np.float64
+        )
+        distances_meters, distances_lightyears = calculate_distances_bulk(origins_xyz, targets_xyz)
+        
+        return json_response([
+            build_distance_response(systems[system_id_1], systems[system_id_2], meters, lightyears)
+            for (system_id_1, system_id_2), meters, lightyears in zip(
+                pairs, distances_meters.tolist(), distances_lightyears.tolist()
+            )
+        ], 200)
         
     except Exception as e:
-        # Log detailed error but return generic message
-        logger.error(f"Unexpected error in calculate_distance: {type(e).__name__}: {str(e)}", exc_info=True)
-        return jsonify({"error": "An unexpected error occurred"}), 500
+        return lookup_error_response(e, "calculate_distances_batch")
 
 
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors."""
-    return jsonify({"error": "Endpoint not found"}), 404
+    return json_response({"error": "Endpoint not found"}, 404)
 
 
 @app.errorhandler(429)
 def ratelimit_handler(e):
     """Handle rate limit exceeded errors."""
     logger.warning(f"Rate limit exceeded: {request.remote_addr}")
-    return jsonify({
+    return json_response({
         "error": "Rate limit exceeded. Please try again later.",
         "retry_after": e.description
-    }), 429
+    }, 429)
 
 
 @app.errorhandler(500)
 def internal_error(error):
     """Handle 500 errors."""
     logger.error(f"Internal server error: {str(error)}")
-    return jsonify({"error": "Internal server error"}), 500
+    return json_response({"error": "Internal server error"}, 500)
 
 
 if __name__ == "__main__":
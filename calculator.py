@@ -1,8 +1,9 @@
 """Distance calculation module for EVE Online systems."""
 
 import math
-from typing import Dict
-from config import LIGHTYEAR_IN_METERS
+from typing import Dict, Tuple
+import numpy as np
+from config import INV_LIGHTYEAR_IN_METERS
 
 
 def calculate_distance(system1: Dict, system2: Dict) -> Dict[str, float]:
@@ -29,17 +30,53 @@ def calculate_distance(system1: Dict, system2: Dict) -> Dict[str, float]:
     x1, y1, z1 = system1["x"], system1["y"], system1["z"]
     x2, y2, z2 = system2["x"], system2["y"], system2["z"]
     
-    # Calculate Euclidean distance in 3D space
-    distance_meters = math.sqrt(
-        (x2 - x1) ** 2 +
-        (y2 - y1) ** 2 +
-        (z2 - z1) ** 2
-    )
+    # Identical points (e.g. a system measured against itself) are zero apart
+    if x1 == x2 and y1 == y2 and z1 == z2:
+        return {
+            "distance_meters": 0.0,
+            "distance_lightyears": 0.0
+        }
+    
+    # Calculate Euclidean distance in 3D space; hypot does the squaring,
+    # summing and square root in a single C call
+    distance_meters = math.hypot(x2 - x1, y2 - y1, z2 - z1)
     
     # Convert to light-years using EVE Online's specific value
-    distance_lightyears = distance_meters / LIGHTYEAR_IN_METERS
+    distance_lightyears = distance_meters * INV_LIGHTYEAR_IN_METERS
     
     return {
         "distance_meters": distance_meters,
         "distance_lightyears": distance_lightyears
     }
+
+
+def calculate_distances_bulk(origins_xyz: np.ndarray, targets_xyz: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate the distances between many pairs of EVE Online systems at once.
+    
+    Vectorized equivalent of calculate_distance for batch requests: row i of
+    the result is the distance between origins_xyz[i] and targets_xyz[i]. A
+    single origin of shape (3,) is broadcast against every target.
+    
+    Args:
+        origins_xyz: Array of shape (N, 3) or (3,) with x, y, z of the first
+            systems
+        targets_xyz: Array of shape (N, 3) with x, y, z of the second systems
+        
+    Returns:
+        Tuple of (distance_meters, distance_lightyears), each of shape (N,)
+    """
+    # Contiguous float64 rows keep NumPy on its SIMD inner loops
+    origins_xyz = np.ascontiguousarray(origins_xyz, dtype=np.float64)
+    targets_xyz = np.ascontiguousarray(targets_xyz, dtype=np.float64)
+    diff = np.subtract(targets_xyz, origins_xyz)
+    
+    # Row-wise dot product of diff with itself, without a squared temporary,
+    # then square root in place
+    distance_meters = np.einsum("ij,ij->i", diff, diff)
+    np.sqrt(distance_meters, out=distance_meters)
+    
+    # Convert to light-years using EVE Online's specific value
+    distance_lightyears = distance_meters * INV_LIGHTYEAR_IN_METERS
+    
+    return distance_meters, distance_lightyears
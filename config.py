@@ -10,13 +10,35 @@ ESI_BASE_URL = "https://esi.evetech.net/latest"
 ESI_COMPATIBILITY_DATE = "2026-02-02"
 ESI_USER_AGENT = "WizardLightYearsCalculator, Username=Dusty Meg"
 
+# Maximum concurrent ESI requests when filling a batch
+ESI_MAX_WORKERS = int(os.getenv("ESI_MAX_WORKERS", "8"))
+
 # System ID Validation
 MIN_SYSTEM_ID = 30000000
 MAX_SYSTEM_ID = 31000000
 
+# Number of systems kept in the in-process lookup cache
+SYSTEM_CACHE_SIZE = int(os.getenv("SYSTEM_CACHE_SIZE", "131072"))
+
+# Stored systems older than this are revalidated against ESI (default 30 days)
+SYSTEM_REFRESH_SECONDS = int(os.getenv("SYSTEM_REFRESH_SECONDS", str(30 * 24 * 60 * 60)))
+
+# A system that couldn't be revalidated is tried again after this long, so an
+# ESI outage doesn't put ESI on the path of every request (default 1 hour)
+SYSTEM_RETRY_SECONDS = int(os.getenv("SYSTEM_RETRY_SECONDS", str(60 * 60)))
+
+# Batch Requests
+MAX_BATCH_PAIRS = int(os.getenv("MAX_BATCH_PAIRS", "1000"))
+
+# Maximum systems fetched or revalidated from ESI for a single request, so one
+# batch can't spend ESI's error budget on IDs that don't exist
+MAX_ESI_FETCHES_PER_REQUEST = int(os.getenv("MAX_ESI_FETCHES_PER_REQUEST", "50"))
+
 # Distance Calculation
 # EVE Online specific lightyear value (9.46 × 10^15 meters)
 LIGHTYEAR_IN_METERS = 9460000000000000.0
+# Multiplying by the reciprocal is cheaper than dividing per calculation
+INV_LIGHTYEAR_IN_METERS = 1.0 / LIGHTYEAR_IN_METERS
 
 # API Configuration
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
@@ -1,46 +1,235 @@
 """Database operations for WizardLightYearsCalculator."""
 
 import sqlite3
-from datetime import datetime
-from typing import Optional, Dict
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, Iterable, Iterator, List
+import numpy as np
 from config import DATABASE_PATH
 
+# SQLite builds before 3.32 cap bound parameters per statement at 999
+SQLITE_MAX_VARIABLES = 999
+
+# Bumped whenever init_db gains a migration step
+SCHEMA_VERSION = 2
+
+# Applied to every new connection
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+
+class SystemIndex:
+    """
+    In-memory copy of the systems table, stored as a structure of arrays.
+    
+    Coordinates live in one contiguous (N, 3) float64 array so they can be
+    sliced straight into the NumPy distance kernel; ``rows`` maps a system ID
+    to its row. Rows are never removed, so lookups need no locking.
+    """
+    
+    def __init__(self):
+        """Initialize an empty index."""
+        self.xyz = np.empty((0, 3), dtype=np.float64)
+        self.updated = np.empty(0, dtype=np.int64)
+        self.names: List[str] = []
+        self.rows: Dict[int, int] = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def add(self, systems: Iterable[Dict]):
+        """
+        Append systems to the index, skipping any that are already present.
+        
+        Args:
+            systems: Dictionaries with system_id, name, x, y, z and
+                last_update keys
+        """
+        with self._lock:
+            new = [s for s in systems if s["system_id"] not in self.rows]
+            if not new:
+                return
+            
+            size = len(self.names)
+            if size + len(new) > len(self.xyz):
+                # Grow geometrically so repeated appends stay amortized O(1)
+                capacity = max(16, 2 * (size + len(new)))
+                xyz = np.empty((capacity, 3), dtype=np.float64)
+                xyz[:size] = self.xyz[:size]
+                updated = np.empty(capacity, dtype=np.int64)
+                updated[:size] = self.updated[:size]
+                self.xyz, self.updated = xyz, updated
+            
+            for row, system in enumerate(new, start=size):
+                self.xyz[row] = (system["x"], system["y"], system["z"])
+                self.updated[row] = system["last_update"]
+                self.names.append(system["name"])
+                # Publish the row last so readers never see a partial entry
+                self.rows[system["system_id"]] = row
+    
+    def update(self, systems: Iterable[Dict]):
+        """
+        Overwrite indexed systems in place, skipping any that aren't present.
+        
+        Args:
+            systems: Dictionaries with system_id, name, x, y, z and
+                last_update keys
+        """
+        with self._lock:
+            for system in systems:
+                row = self.rows.get(system["system_id"])
+                if row is not None:
+                    self.xyz[row] = (system["x"], system["y"], system["z"])
+                    self.updated[row] = system["last_update"]
+                    self.names[row] = system["name"]
+    
+    def get(self, system_id: int) -> Optional[Dict]:
+        """
+        Look up a system in the index.
+        
+        Args:
+            system_id: The EVE Online system ID
+            
+        Returns:
+            Dictionary with system_id, name, x, y, z and last_update or None
+            if not indexed
+        """
+        row = self.rows.get(system_id)
+        if row is None:
+            return None
+        
+        x, y, z = self.xyz[row].tolist()
+        return {
+            "system_id": system_id,
+            "name": self.names[row],
+            "x": x,
+            "y": y,
+            "z": z,
+            "last_update": int(self.updated[row])
+        }
+    
+    def get_many(self, system_ids: Iterable[int]) -> Dict[int, Dict]:
+        """
+        Look up several systems in the index.
+        
+        Args:
+            system_ids: The EVE Online system IDs
+            
+        Returns:
+            Dictionary mapping system ID to system information. IDs not in
+            the index are omitted.
+        """
+        systems = {}
+        for system_id in system_ids:
+            system = self.get(system_id)
+            if system is not None:
+                systems[system_id] = system
+        return systems
+
 
 class Database:
     """Handles all database operations."""
     
     def __init__(self, db_path: str = DATABASE_PATH):
-        """Initialize database connection."""
+        """Initialize database connection and load the in-memory index."""
         self.db_path = db_path
+        self._local = threading.local()
+        self.index = SystemIndex()
         self.init_db()
+        self.load_index()
     
     def get_connection(self) -> sqlite3.Connection:
-        """Create and return a database connection."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """
+        Return this thread's database connection, opening it on first use.
+        
+        Each thread keeps one long-lived connection in autocommit mode, so
+        lookups don't pay for opening the file and reading the schema on every
+        call. Writes use transaction() for explicit BEGIN/COMMIT.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
         return conn
     
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run the enclosed statements in a single transaction."""
+        conn = self.get_connection()
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    
+    def close(self):
+        """Close this thread's database connection, if open."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
     def init_db(self):
         """Initialize the database schema."""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
-        cursor.execute("""
+        # system_id must stay declared exactly INTEGER PRIMARY KEY: that makes
+        # it an alias for the rowid, so the table is a single B-tree keyed on
+        # system_id with no separate index and lookups are one descent.
+        # WITHOUT ROWID would not save anything for a single integer key.
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS systems (
                 system_id INTEGER PRIMARY KEY,
                 name TEXT NOT NULL,
                 x REAL NOT NULL,
                 y REAL NOT NULL,
                 z REAL NOT NULL,
-                added TIMESTAMP NOT NULL,
-                last_update TIMESTAMP NOT NULL
+                added INTEGER NOT NULL,
+                last_update INTEGER NOT NULL,
+                etag TEXT
             )
         """)
         
-        conn.commit()
-        conn.close()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            with self.transaction():
+                if version < 1:
+                    # Version 0 stored timestamps as ISO-8601 text; convert them
+                    # to Unix epoch seconds
+                    conn.execute("""
+                        UPDATE systems
+                        SET added = CAST(strftime('%s', added) AS INTEGER),
+                            last_update = CAST(strftime('%s', last_update) AS INTEGER)
+                        WHERE typeof(added) = 'text' OR typeof(last_update) = 'text'
+                    """)
+                if version < 2:
+                    # Version 1 didn't store the ESI ETag
+                    columns = [row["name"] for row in conn.execute("PRAGMA table_info(systems)")]
+                    if "etag" not in columns:
+                        conn.execute("ALTER TABLE systems ADD COLUMN etag TEXT")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     
-    def get_system(self, system_id: int) -> Optional[Dict]:
+    def load_index(self):
+        """Load every stored system into the in-memory index."""
+        rows = self.get_connection().execute("""
+            SELECT system_id, name, x, y, z, last_update
+            FROM systems
+        """).fetchall()
+        
+        self.index.add(rows)
+    
+    def get_system(self, system_id: int) -> Optional[sqlite3.Row]:
         """
         Retrieve system information from database.
         
@@ -50,70 +239,182 @@ class Database:
             system_id: The EVE Online system ID
             
         Returns:
-            Dictionary with system information or None if not found
+            Row with system information, indexable by column name like a
+            dictionary, or None if not found
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         # Parameterized query prevents SQL injection
-        cursor.execute("""
-            SELECT system_id, name, x, y, z, added, last_update
+        return self.get_connection().execute("""
+            SELECT system_id, name, x, y, z, added, last_update, etag
             FROM systems
             WHERE system_id = ?
-        """, (system_id,))
+        """, (system_id,)).fetchone()
+    
+    def get_systems(self, system_ids: Iterable[int]) -> Dict[int, Dict]:
+        """
+        Retrieve several systems from the database in as few queries as possible.
         
-        row = cursor.fetchone()
-        conn.close()
+        IDs are looked up with ``WHERE system_id IN (...)``, chunked so that no
+        statement exceeds SQLite's bound parameter limit.
+        
+        Args:
+            system_ids: The EVE Online system IDs to look up
+            
+        Returns:
+            Dictionary mapping system ID to system information. IDs not present
+            in the database are omitted.
+        """
+        ids = list(dict.fromkeys(system_ids))
+        systems = {}
+        if not ids:
+            return systems
         
-        if row:
-            return {
-                "system_id": row["system_id"],
-                "name": row["name"],
-                "x": row["x"],
-                "y": row["y"],
-                "z": row["z"],
-                "added": row["added"],
-                "last_update": row["last_update"]
-            }
-        return None
+        conn = self.get_connection()
+        
+        for start in range(0, len(ids), SQLITE_MAX_VARIABLES):
+            chunk = ids[start:start + SQLITE_MAX_VARIABLES]
+            placeholders = ",".join("?" * len(chunk))
+            # Only placeholders are interpolated; values are still bound
+            rows = conn.execute(f"""
+                SELECT system_id, name, x, y, z, added, last_update, etag
+                FROM systems
+                WHERE system_id IN ({placeholders})
+            """, chunk).fetchall()
+            
+            for row in rows:
+                systems[row["system_id"]] = {
+                    "system_id": row["system_id"],
+                    "name": row["name"],
+                    "x": row["x"],
+                    "y": row["y"],
+                    "z": row["z"],
+                    "added": row["added"],
+                    "last_update": row["last_update"],
+                    "etag": row["etag"]
+                }
+        
+        return systems
     
-    def insert_system(self, system_id: int, name: str, x: float, y: float, z: float):
+    def insert_system(self, system_id: int, name: str, x: float, y: float, z: float,
+                      etag: Optional[str] = None) -> Dict:
         """
         Insert a new system into the database.
         
+        If the system already exists (e.g. inserted by a concurrent request)
+        the stored row is left untouched and returned instead.
+        
         Args:
             system_id: The EVE Online system ID
             name: System name
             x, y, z: Position coordinates
+            etag: ESI ETag of the system data, if known
+            
+        Returns:
+            Dictionary containing the stored system information
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        now = datetime.utcnow().isoformat()
+        now = int(time.time())
         
-        cursor.execute("""
-            INSERT INTO systems (system_id, name, x, y, z, added, last_update)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (system_id, name, x, y, z, now, now))
+        # RETURNING (SQLite 3.35+) hands back the stored row without a second
+        # query; the no-op DO UPDATE makes it return an existing row too
+        row = self.get_connection().execute("""
+            INSERT INTO systems (system_id, name, x, y, z, added, last_update, etag)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(system_id) DO UPDATE SET system_id = excluded.system_id
+            RETURNING system_id, name, x, y, z, added, last_update, etag
+        """, (system_id, name, x, y, z, now, now, etag)).fetchone()
         
-        conn.commit()
-        conn.close()
+        system = dict(row)
+        self.index.add([system])
+        return system
     
-    def update_system_timestamp(self, system_id: int):
+    def insert_systems(self, systems: List[Dict]):
         """
-        Update the last_update timestamp for a system.
+        Insert several systems into the database in a single transaction.
+        
+        Rows that already exist (e.g. inserted by a concurrent request) are
+        left untouched.
         
         Args:
-            system_id: The EVE Online system ID
+            systems: Dictionaries with system_id, name, x, y and z keys, and
+                optionally etag
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        now = datetime.utcnow().isoformat()
+        if not systems:
+            return
         
-        cursor.execute("""
-            UPDATE systems
-            SET last_update = ?
-            WHERE system_id = ?
-        """, (now, system_id))
+        now = int(time.time())
+        
+        with self.transaction() as conn:
+            conn.executemany("""
+                INSERT OR IGNORE INTO systems (system_id, name, x, y, z, added, last_update, etag)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (s["system_id"], s["name"], s["x"], s["y"], s["z"], now, now, s.get("etag"))
+                for s in systems
+            ])
+        
+        self.index.add([dict(s, last_update=now) for s in systems])
+    
+    def refresh_systems(self, changed: List[Dict], unchanged: List[int]):
+        """
+        Record the result of revalidating systems against ESI.
+        
+        Both lists get a new last_update; changed systems also get their new
+        name, position and ETag.
+        
+        Args:
+            changed: Dictionaries with system_id, name, x, y, z and etag keys
+                for systems ESI returned new data for
+            unchanged: IDs of systems ESI reported as not modified
+            
+        Returns:
+            List of refreshed system dictionaries, including last_update
+        """
+        now = int(time.time())
+        
+        with self.transaction() as conn:
+            conn.executemany("""
+                UPDATE systems
+                SET name = ?, x = ?, y = ?, z = ?, etag = ?, last_update = ?
+                WHERE system_id = ?
+            """, [
+                (s["name"], s["x"], s["y"], s["z"], s["etag"], now, s["system_id"])
+                for s in changed
+            ])
+            conn.executemany("""
+                UPDATE systems
+                SET last_update = ?
+                WHERE system_id = ?
+            """, [(now, system_id) for system_id in unchanged])
+        
+        refreshed = [dict(s, last_update=now) for s in changed]
+        for system_id in unchanged:
+            system = self.index.get(system_id)
+            if system is not None:
+                refreshed.append(dict(system, last_update=now))
+        self.index.update(refreshed)
+        return refreshed
+    
+    def set_last_update(self, system_ids: List[int], last_update: int) -> List[Dict]:
+        """
+        Set the last_update timestamp of several systems.
+        
+        Args:
+            system_ids: The EVE Online system IDs
+            last_update: The new timestamp
+            
+        Returns:
+            List of the updated system dictionaries that are indexed
+        """
+        with self.transaction() as conn:
+            conn.executemany("""
+                UPDATE systems
+                SET last_update = ?
+                WHERE system_id = ?
+            """, [(last_update, system_id) for system_id in system_ids])
         
-        conn.commit()
-        conn.close()
+        updated = []
+        for system_id in system_ids:
+            system = self.index.get(system_id)
+            if system is not None:
+                updated.append(dict(system, last_update=last_update))
+        self.index.update(updated)
+        return updated
@@ -1,8 +1,10 @@
 """ESI API client for fetching EVE Online system data."""
 
 import requests
-from typing import Dict
-from config import ESI_BASE_URL, ESI_COMPATIBILITY_DATE, ESI_USER_AGENT
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional
+from config import ESI_BASE_URL, ESI_COMPATIBILITY_DATE, ESI_USER_AGENT, ESI_MAX_WORKERS
 
 
 class ESIClient:
@@ -15,16 +17,24 @@ class ESIClient:
             "X-Compatibility-Date": ESI_COMPATIBILITY_DATE,
             "user-agent": ESI_USER_AGENT
         }
+        
+        # Reuse connections (and TLS sessions) across requests; the pool is
+        # sized so concurrent batch fetches don't open extra connections
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=ESI_MAX_WORKERS))
     
-    def get_system_info(self, system_id: int) -> Dict:
+    def get_system_info(self, system_id: int, etag: Optional[str] = None) -> Optional[Dict]:
         """
         Fetch system information from ESI API.
         
         Args:
             system_id: The EVE Online system ID
+            etag: ETag from an earlier response; if given, ESI replies
+                304 Not Modified when the system hasn't changed
             
         Returns:
-            Dictionary containing system information
+            Dictionary containing system information and its ETag, or None if
+            etag was given and the system hasn't changed
             
         Raises:
             requests.exceptions.RequestException: If API request fails
@@ -32,7 +42,10 @@ class ESIClient:
         url = f"{self.base_url}/universe/systems/{system_id}/"
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            headers = self.headers if etag is None else {**self.headers, "If-None-Match": etag}
+            response = self.session.get(url, headers=headers, timeout=10)
+            if response.status_code == 304:
+                return None
             response.raise_for_status()
             
             data = response.json()
@@ -43,7 +56,8 @@ class ESIClient:
                 "name": data["name"],
                 "x": data["position"]["x"],
                 "y": data["position"]["y"],
-                "z": data["position"]["z"]
+                "z": data["position"]["z"],
+                "etag": response.headers.get("ETag")
             }
             
         except requests.exceptions.HTTPError as e:
@@ -54,3 +68,50 @@ class ESIClient:
             raise RuntimeError(f"Failed to fetch system data from ESI: {str(e)}")
         except (KeyError, ValueError) as e:
             raise RuntimeError(f"Invalid response format from ESI: {str(e)}")
+    
+    def get_systems_info(self, system_ids: List[int],
+                         etags: Optional[Dict[int, str]] = None,
+                         return_exceptions: bool = False) -> List[Optional[Dict]]:
+        """
+        Fetch information for several systems from ESI concurrently.
+        
+        Args:
+            system_ids: The EVE Online system IDs
+            etags: Optional mapping of system ID to ETag from an earlier
+                response, to revalidate rather than refetch those systems
+            return_exceptions: If True, every system is fetched and a failed
+                fetch's exception is returned in its place instead of raised
+            
+        Returns:
+            List of system information dictionaries, in the order requested;
+            None for systems whose ETag shows they haven't changed
+            
+        Raises:
+            ValueError: If any system is not found, unless return_exceptions
+            RuntimeError: If any API request fails, unless return_exceptions
+        """
+        if not system_ids:
+            return []
+        
+        etags = etags or {}
+        pool = ThreadPoolExecutor(max_workers=min(ESI_MAX_WORKERS, len(system_ids)))
+        try:
+            futures = [
+                pool.submit(self.get_system_info, system_id, etags.get(system_id))
+                for system_id in system_ids
+            ]
+            if return_exceptions:
+                wait(futures)
+                return [future.exception() or future.result() for future in futures]
+            
+            # Wake on whichever fetch fails first, not just the earliest
+            # submitted, so a slow fetch can't hold the batch open
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in done:
+                if future.exception() is not None:
+                    raise future.exception()
+            return [future.result() for future in futures]
+        finally:
+            # On a failure, drop queued fetches rather than sending requests
+            # whose results would be thrown away
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,53 @@
+"""Gunicorn configuration for WizardLightYearsCalculator API.
+
+Run with: gunicorn -c gunicorn_conf.py app:app
+"""
+
+import multiprocessing
+import os
+
+from config import API_HOST, API_PORT
+
+bind = f"{API_HOST}:{API_PORT}"
+
+
+def _usable_cpu_count():
+    """Count the cores this process may run on, honouring cpusets and affinity."""
+    # cpu_count() reports every core on the host, even in a container limited to a few
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return multiprocessing.cpu_count()
+
+
+# Load the app (and the in-memory system index) once in the master so
+# workers share its pages copy-on-write instead of each loading their own
+preload_app = True
+
+# Each worker keeps its own rate limit counters, so the effective per-IP
+# limit scales with the worker count
+workers = int(os.getenv("GUNICORN_WORKERS", str(_usable_cpu_count())))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# Pin each worker to one core (Linux only); disable with GUNICORN_PIN_WORKERS=False
+pin_workers = os.getenv("GUNICORN_PIN_WORKERS", "True").lower() == "true"
+
+
+def when_ready(server):
+    """Close the master's SQLite connection before any workers are forked."""
+    # SQLite connections must not be carried across fork(); each worker
+    # thread opens its own on first use
+    from app import db
+    db.close()
+
+
+def post_fork(server, worker):
+    """Pin the new worker to a single CPU core."""
+    if not pin_workers or not hasattr(os, "sched_setaffinity"):
+        return
+
+    cores = sorted(os.sched_getaffinity(0))
+    # worker.age increases with every spawn, so replacements rotate across cores
+    core = cores[worker.age % len(cores)]
+    os.sched_setaffinity(0, {core})
+    server.log.info(f"Worker {worker.pid} pinned to CPU {core}")
@@ -0,0 +1,98 @@
+"""In-process token bucket rate limiting for WizardLightYearsCalculator."""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, List, Optional
+from flask import abort, current_app, request
+
+
+class TokenBucketLimiter:
+    """
+    Per-client token bucket.
+    
+    Each client starts with a full bucket of ``rate`` tokens that refills
+    continuously over ``period`` seconds; a request spends one token and is
+    rejected when the bucket is empty. Only the most recently seen
+    ``max_clients`` buckets are kept.
+    """
+    
+    def __init__(self, rate: int, period: float = 60.0, max_clients: int = 65536):
+        """
+        Initialize the limiter.
+        
+        Args:
+            rate: Sustained requests per period, also the burst size
+            period: Length of the period in seconds
+            max_clients: Number of client buckets to keep before evicting the
+                least recently seen
+        """
+        self.capacity = float(rate)
+        self.refill_per_second = rate / period
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def allow(self, key: str) -> bool:
+        """
+        Spend a token for a client if one is available.
+        
+        Args:
+            key: Client identifier, e.g. the remote address
+            
+        Returns:
+            True if the request is allowed, False if it should be rejected
+        """
+        now = time.monotonic()
+        
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_clients:
+                    self._buckets.popitem(last=False)
+                bucket = self._buckets[key] = [self.capacity, now]
+            else:
+                self._buckets.move_to_end(key)
+                tokens, last = bucket
+                bucket[0] = min(self.capacity, tokens + (now - last) * self.refill_per_second)
+                bucket[1] = now
+            
+            if bucket[0] < 1.0:
+                return False
+            bucket[0] -= 1.0
+            return True
+
+
+def limit_per_client(rate_per_minute: int, rate_per_hour: Optional[int] = None) -> Callable:
+    """
+    Decorate a view so each client may call it at most ``rate_per_minute``
+    times a minute and, if given, ``rate_per_hour`` times an hour.
+    
+    Every decorated view gets its own buckets. A request rejected by the
+    per-minute limit doesn't count towards the hourly one. Limiting is
+    skipped when the app's ``RATE_LIMIT_ENABLED`` config is false.
+    
+    Args:
+        rate_per_minute: Sustained requests per minute per client
+        rate_per_hour: Sustained requests per hour per client, or None for
+            no hourly limit
+        
+    Returns:
+        View decorator that aborts with 429 when a limit is exceeded
+    """
+    limits = [(TokenBucketLimiter(rate_per_minute), f"{rate_per_minute} per 1 minute")]
+    if rate_per_hour is not None:
+        limits.append((TokenBucketLimiter(rate_per_hour, period=3600.0), f"{rate_per_hour} per 1 hour"))
+    
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if current_app.config.get("RATE_LIMIT_ENABLED", True):
+                for limiter, description in limits:
+                    if not limiter.allow(request.remote_addr):
+                        abort(429, description=description)
+            return view(*args, **kwargs)
+        return wrapped
+    
+    return decorator
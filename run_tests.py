@@ -8,6 +8,9 @@ import os
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
+# Point DATABASE_PATH at a temporary database before any test module loads
+import tests.support  # noqa: F401
+
 
 def run_all_tests():
     """Discover and run all tests."""
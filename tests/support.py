@@ -0,0 +1,19 @@
+"""Per-process database setup for test modules that open the database.
+
+Runners such as ``unittest discover tests`` import the test modules as
+top-level modules, so ``tests/__init__.py`` doesn't run under them; modules
+that import ``app`` or ``database`` import this first instead, as does
+run_tests.py.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+# Give each test process its own database so parallel runs (pytest -n) don't
+# share a file and the working tree stays clean
+if "DATABASE_PATH" not in os.environ:
+    _db_dir = tempfile.mkdtemp(prefix="wizard-tests-")
+    atexit.register(shutil.rmtree, _db_dir, ignore_errors=True)
+    os.environ["DATABASE_PATH"] = os.path.join(_db_dir, "test.db")
@@ -3,32 +3,35 @@
 import unittest
 import sys
 import os
-import json
+import orjson
 from unittest.mock import patch, Mock
 import tempfile
+import time
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app import app, db
-from config import MIN_SYSTEM_ID, MAX_SYSTEM_ID
+import tests.support  # noqa: F401  points DATABASE_PATH at a temporary database
+from app import app, db, limiter, get_or_fetch_system, get_or_fetch_systems, _cached_system
+from database import Database, SystemIndex
+from config import MIN_SYSTEM_ID, MAX_SYSTEM_ID, SYSTEM_REFRESH_SECONDS, SYSTEM_RETRY_SECONDS
 
 
 class TestAPIEndpoints(unittest.TestCase):
     """Test cases for API endpoints."""
     
-    def setUp(self):
-        """Set up test fixtures."""
-        # Create a test database in memory
+    @classmethod
+    def setUpClass(cls):
+        """Set up test fixtures shared by every test."""
         app.config['TESTING'] = True
         app.config['RATE_LIMIT_ENABLED'] = False  # Disable rate limiting for tests
-        self.client = app.test_client()
+        cls.client = app.test_client()
         
         # Sample test data
-        self.valid_system_1 = 30000142  # Jita
-        self.valid_system_2 = 30000144  # Perimeter
+        cls.valid_system_1 = 30000142  # Jita
+        cls.valid_system_2 = 30000144  # Perimeter
         
-        self.mock_system_data_1 = {
+        cls.mock_system_data_1 = {
             "system_id": 30000142,
             "name": "Jita",
             "x": -129400292875304960.0,
@@ -38,7 +41,7 @@ class TestAPIEndpoints(unittest.TestCase):
             "last_update": "2026-02-20T00:00:00"
         }
         
-        self.mock_system_data_2 = {
+        cls.mock_system_data_2 = {
             "system_id": 30000144,
             "name": "Perimeter",
             "x": -129524275563970560.0,
@@ -53,7 +56,7 @@ class TestAPIEndpoints(unittest.TestCase):
         response = self.client.get('/')
         
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.data)
+        data = orjson.loads(response.data)
         
         self.assertIn("api", data)
         self.assertIn("version", data)
@@ -66,14 +69,14 @@ class TestAPIEndpoints(unittest.TestCase):
             mock_fetch.side_effect = [self.mock_system_data_1, self.mock_system_data_2]
             
             response = self.client.post('/calculate-distance',
-                                       data=json.dumps({
+                                       data=orjson.dumps({
                                            'system_id_1': self.valid_system_1,
                                            'system_id_2': self.valid_system_2
                                        }),
                                        content_type='application/json')
             
             self.assertEqual(response.status_code, 200)
-            data = json.loads(response.data)
+            data = orjson.loads(response.data)
             
             self.assertIn("system_1", data)
             self.assertIn("system_2", data)
@@ -95,7 +98,7 @@ class TestAPIEndpoints(unittest.TestCase):
             )
             
             self.assertEqual(response.status_code, 200)
-            data = json.loads(response.data)
+            data = orjson.loads(response.data)
             
             self.assertIn("distance_lightyears", data)
             self.assertEqual(data["system_1"]["name"], "Jita")
@@ -104,62 +107,62 @@ class TestAPIEndpoints(unittest.TestCase):
     def test_missing_system_id_1(self):
         """Test error when system_id_1 is missing."""
         response = self.client.post('/calculate-distance',
-                                   data=json.dumps({'system_id_2': self.valid_system_2}),
+                                   data=orjson.dumps({'system_id_2': self.valid_system_2}),
                                    content_type='application/json')
         
         self.assertEqual(response.status_code, 400)
-        data = json.loads(response.data)
+        data = orjson.loads(response.data)
         self.assertIn("error", data)
         self.assertIn("required", data["error"].lower())
     
     def test_missing_system_id_2(self):
         """Test error when system_id_2 is missing."""
         response = self.client.post('/calculate-distance',
-                                   data=json.dumps({'system_id_1': self.valid_system_1}),
+                                   data=orjson.dumps({'system_id_1': self.valid_system_1}),
                                    content_type='application/json')
         
         self.assertEqual(response.status_code, 400)
-        data = json.loads(response.data)
+        data = orjson.loads(response.data)
         self.assertIn("error", data)
     
     def test_invalid_system_id_type(self):
         """Test error when system ID is not an integer."""
         response = self.client.post('/calculate-distance',
-                                   data=json.dumps({
+                                   data=orjson.dumps({
                                        'system_id_1': "not_a_number",
                                        'system_id_2': self.valid_system_2
                                    }),
                                    content_type='application/json')
         
         self.assertEqual(response.status_code, 400)
-        data = json.loads(response.data)
+        data = orjson.loads(response.data)
         self.assertIn("error", data)
     
     def test_system_id_below_range(self):
         """Test error when system ID is below valid range."""
         response = self.client.post('/calculate-distance',
-                                   data=json.dumps({
+                                   data=orjson.dumps({
                                        'system_id_1': MIN_SYSTEM_ID - 1,
                                        'system_id_2': self.valid_system_2
                                    }),
                                    content_type='application/json')
         
         self.assertEqual(response.status_code, 400)
-        data = json.loads(response.data)
+        data = orjson.loads(response.data)
         self.assertIn("error", data)
         self.assertIn("between", data["error"].lower())
     
     def test_system_id_above_range(self):
         """Test error when system ID is above valid range."""
         response = self.client.post('/calculate-distance',
-                                   data=json.dumps({
+                                   data=orjson.dumps({
                                        'system_id_1': self.valid_system_1,
                                        'system_id_2': MAX_SYSTEM_ID + 1
                                    }),
                                    content_type='application/json')
         
         self.assertEqual(response.status_code, 400)
-        data = json.loads(response.data)
+        data = orjson.loads(response.data)
         self.assertIn("error", data)
     
     def test_system_not_found_in_esi(self):
@@ -168,14 +171,14 @@ class TestAPIEndpoints(unittest.TestCase):
             mock_fetch.side_effect = ValueError("System ID 30000142 not found")
             
             response = self.client.post('/calculate-distance',
-                                       data=json.dumps({
+                                       data=orjson.dumps({
                                            'system_id_1': self.valid_system_1,
                                            'system_id_2': self.valid_system_2
                                        }),
                                        content_type='application/json')
             
             self.assertEqual(response.status_code, 404)
-            data = json.loads(response.data)
+            data = orjson.loads(response.data)
             self.assertIn("error", data)
     
     def test_esi_api_unavailable(self):
@@ -184,14 +187,14 @@ class TestAPIEndpoints(unittest.TestCase):
             mock_fetch.side_effect = RuntimeError("Failed to fetch system data from ESI")
             
             response = self.client.post('/calculate-distance',
-                                       data=json.dumps({
+                                       data=orjson.dumps({
                                            'system_id_1': self.valid_system_1,
                                            'system_id_2': self.valid_system_2
                                        }),
                                        content_type='application/json')
             
             self.assertEqual(response.status_code, 502)
-            data = json.loads(response.data)
+            data = orjson.loads(response.data)
             self.assertIn("error", data)
     
     def test_404_endpoint(self):
@@ -199,27 +202,43 @@ class TestAPIEndpoints(unittest.TestCase):
         response = self.client.get('/nonexistent-endpoint')
         
         self.assertEqual(response.status_code, 404)
-        data = json.loads(response.data)
+        data = orjson.loads(response.data)
         self.assertIn("error", data)
     
+    def test_distance_routes_skip_flask_limiter(self):
+        """Test that the distance routes rely only on their in-process limits."""
+        if not limiter.enabled:
+            self.skipTest("Flask-Limiter is disabled by RATE_LIMIT_ENABLED")
+        with patch.object(limiter.limiter, 'hit', wraps=limiter.limiter.hit) as mock_hit:
+            self.client.post('/calculate-distance', data=b'{}', content_type='application/json')
+            self.client.post('/calculate-distances', data=b'{}', content_type='application/json')
+            self.assertEqual(mock_hit.call_count, 0)
+            
+            self.client.get('/')
+            self.assertEqual(mock_hit.call_count, 1)
+    
     def test_both_systems_same(self):
         """Test calculating distance between the same system."""
         with patch('app.get_or_fetch_system') as mock_fetch:
             mock_fetch.return_value = self.mock_system_data_1
             
             response = self.client.post('/calculate-distance',
-                                       data=json.dumps({
+                                       data=orjson.dumps({
                                            'system_id_1': self.valid_system_1,
                                            'system_id_2': self.valid_system_1
                                        }),
                                        content_type='application/json')
             
             self.assertEqual(response.status_code, 200)
-            data = json.loads(response.data)
+            data = orjson.loads(response.data)
             
             # Distance should be 0
             self.assertEqual(data["distance_meters"], 0.0)
             self.assertEqual(data["distance_lightyears"], 0.0)
+            self.assertEqual(data["system_2"]["name"], "Jita")
+            
+            # The system is only looked up once
+            mock_fetch.assert_called_once_with(self.valid_system_1)
     
     def test_response_includes_system_names(self):
         """Test that response includes system names."""
@@ -227,16 +246,293 @@ class TestAPIEndpoints(unittest.TestCase):
             mock_fetch.side_effect = [self.mock_system_data_1, self.mock_system_data_2]
             
             response = self.client.post('/calculate-distance',
-                                       data=json.dumps({
+                                       data=orjson.dumps({
                                            'system_id_1': self.valid_system_1,
                                            'system_id_2': self.valid_system_2
                                        }),
                                        content_type='application/json')
             
-            data = json.loads(response.data)
+            data = orjson.loads(response.data)
             
             self.assertEqual(data["system_1"]["name"], "Jita")
             self.assertEqual(data["system_2"]["name"], "Perimeter")
+    
+    def test_calculate_distances_batch_pairs(self):
+        """Test batch request with a list of pairs."""
+        with patch('app.get_or_fetch_systems') as mock_fetch:
+            mock_fetch.return_value = {
+                self.valid_system_1: self.mock_system_data_1,
+                self.valid_system_2: self.mock_system_data_2
+            }
+            
+            response = self.client.post('/calculate-distances',
+                                       data=orjson.dumps({
+                                           'pairs': [
+                                               [self.valid_system_1, self.valid_system_2],
+                                               [self.valid_system_2, self.valid_system_1]
+                                           ]
+                                       }),
+                                       content_type='application/json')
+            
+            self.assertEqual(response.status_code, 200)
+            data = orjson.loads(response.data)
+            
+            self.assertEqual(len(data), 2)
+            self.assertEqual(data[0]["system_1"]["name"], "Jita")
+            self.assertEqual(data[1]["system_1"]["name"], "Perimeter")
+            self.assertEqual(data[0]["distance_meters"], data[1]["distance_meters"])
+            self.assertGreater(data[0]["distance_lightyears"], 0)
+            
+            # Each system ID is only looked up once
+            self.assertEqual(mock_fetch.call_count, 1)
+            self.assertEqual(
+                sorted(mock_fetch.call_args[0][0]),
+                sorted([self.valid_system_1, self.valid_system_2] * 2)
+            )
+    
+    def test_calculate_distances_batch_origin_targets(self):
+        """Test batch request with an origin and list of targets."""
+        with patch('app.get_or_fetch_systems') as mock_fetch:
+            mock_fetch.return_value = {
+                self.valid_system_1: self.mock_system_data_1,
+                self.valid_system_2: self.mock_system_data_2
+            }
+            
+            response = self.client.post('/calculate-distances',
+                                       data=orjson.dumps({
+                                           'origin': self.valid_system_1,
+                                           'targets': [self.valid_system_2, self.valid_system_1]
+                                       }),
+                                       content_type='application/json')
+            
+            self.assertEqual(response.status_code, 200)
+            data = orjson.loads(response.data)
+            
+            self.assertEqual(len(data), 2)
+            self.assertEqual(data[0]["system_2"]["system_id"], self.valid_system_2)
+            self.assertEqual(data[1]["distance_meters"], 0.0)
+    
+    def test_calculate_distances_batch_invalid_system_id(self):
+        """Test batch error identifies the invalid system ID."""
+        response = self.client.post('/calculate-distances',
+                                   data=orjson.dumps({
+                                       'pairs': [
+                                           [self.valid_system_1, self.valid_system_2],
+                                           [self.valid_system_1, MAX_SYSTEM_ID + 1]
+                                       ]
+                                   }),
+                                   content_type='application/json')
+        
+        self.assertEqual(response.status_code, 400)
+        data = orjson.loads(response.data)
+        self.assertIn("pairs[1][1]", data["error"])
+        self.assertIn("between", data["error"].lower())
+    
+    def test_calculate_distances_batch_missing_pairs(self):
+        """Test batch error when neither pairs nor origin/targets are given."""
+        response = self.client.post('/calculate-distances',
+                                   data=orjson.dumps({'origin': self.valid_system_1}),
+                                   content_type='application/json')
+        
+        self.assertEqual(response.status_code, 400)
+        data = orjson.loads(response.data)
+        self.assertIn("required", data["error"].lower())
+    
+    def test_calculate_distances_batch_too_many_pairs(self):
+        """Test batch error when the batch exceeds the maximum size."""
+        with patch('app.MAX_BATCH_PAIRS', 2):
+            response = self.client.post('/calculate-distances',
+                                       data=orjson.dumps({
+                                           'origin': self.valid_system_1,
+                                           'targets': [self.valid_system_2] * 3
+                                       }),
+                                       content_type='application/json')
+        
+        self.assertEqual(response.status_code, 400)
+        data = orjson.loads(response.data)
+        self.assertIn("at most", data["error"].lower())
+    
+    def test_calculate_distances_batch_size_checked_first(self):
+        """Test that an oversized batch is rejected before its pairs are inspected."""
+        with patch('app.MAX_BATCH_PAIRS', 2), patch('app.validate_system_id') as mock_validate:
+            response = self.client.post('/calculate-distances',
+                                       data=orjson.dumps({'pairs': [['not', 'pairs', 'at all']] * 3}),
+                                       content_type='application/json')
+        
+        mock_validate.assert_not_called()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("at most", orjson.loads(response.data)["error"].lower())
+    
+    def test_calculate_distances_batch_system_not_found(self):
+        """Test batch handling when a system is not found in ESI."""
+        with patch('app.get_or_fetch_systems') as mock_fetch:
+            mock_fetch.side_effect = ValueError("System ID 30000144 not found")
+            
+            response = self.client.post('/calculate-distances',
+                                       data=orjson.dumps({
+                                           'pairs': [[self.valid_system_1, self.valid_system_2]]
+                                       }),
+                                       content_type='application/json')
+            
+            self.assertEqual(response.status_code, 404)
+
+
+class TestSystemLookup(unittest.TestCase):
+    """Test cases for system lookups against a temporary database."""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Set up a test client shared by every test."""
+        app.config['TESTING'] = True
+        app.config['RATE_LIMIT_ENABLED'] = False
+        cls.client = app.test_client()
+    
+    def setUp(self):
+        """Point the app at a fresh database with an empty lookup cache and ESI stubbed out."""
+        _cached_system.cache_clear()
+        self.addCleanup(_cached_system.cache_clear)
+        
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.db = Database(os.path.join(tmp_dir.name, "test.db"))
+        self.addCleanup(self.db.close)
+        
+        db_patcher = patch('app.db', self.db)
+        db_patcher.start()
+        self.addCleanup(db_patcher.stop)
+        
+        esi_patcher = patch('app.esi.get_system_info')
+        self.mock_esi = esi_patcher.start()
+        self.addCleanup(esi_patcher.stop)
+    
+    def _expire_stored_systems(self):
+        """Mark every stored system as last updated at the epoch and reload the index."""
+        self.db.get_connection().execute("UPDATE systems SET last_update = 0")
+        self.db.index = SystemIndex()
+        self.db.load_index()
+    
+    def test_get_or_fetch_systems_fetches_only_missing(self):
+        """Test that only systems missing from the database are fetched from ESI."""
+        self.db.insert_system(30000142, "Jita", 1.0, 2.0, 3.0)
+        self.mock_esi.return_value = {
+            "system_id": 30000144, "name": "Perimeter", "x": 4.0, "y": 5.0, "z": 6.0
+        }
+        
+        systems = get_or_fetch_systems([30000142, 30000144, 30000142])
+        
+        self.mock_esi.assert_called_once_with(30000144, None)
+        self.assertEqual(systems[30000142]["name"], "Jita")
+        self.assertEqual(systems[30000144]["name"], "Perimeter")
+        self.assertIn(30000144, self.db.get_systems([30000144]))
+    
+    def test_get_or_fetch_systems_limits_esi_fetches(self):
+        """Test that a batch needing too many ESI fetches is rejected before any are made."""
+        with patch('app.MAX_ESI_FETCHES_PER_REQUEST', 1):
+            response = self.client.post('/calculate-distances',
+                                       data=orjson.dumps({'pairs': [[30000142, 30000144]]}),
+                                       content_type='application/json')
+        
+        self.mock_esi.assert_not_called()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("at most 1", orjson.loads(response.data)["error"])
+    
+    def test_get_or_fetch_system_cached(self):
+        """Test that repeat lookups are served without touching the database."""
+        self.db.insert_system(30000142, "Jita", 1.0, 2.0, 3.0)
+        
+        first = get_or_fetch_system(30000142)
+        with patch.object(self.db, 'get_system') as mock_get:
+            second = get_or_fetch_system(30000142)
+        
+        mock_get.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertEqual(first, {"system_id": 30000142, "name": "Jita", "x": 1.0, "y": 2.0, "z": 3.0})
+    
+    def test_stale_system_revalidated_with_etag(self):
+        """Test that stale systems are revalidated with their stored ETag."""
+        self.db.insert_system(30000142, "Jita", 1.0, 2.0, 3.0, etag='"a"')
+        self.db.insert_system(30000144, "Perimeter", 4.0, 5.0, 6.0, etag='"b"')
+        self._expire_stored_systems()
+        changed = {"system_id": 30000144, "name": "Perimeter", "x": 7.0, "y": 8.0, "z": 9.0, "etag": '"c"'}
+        # Fetches run concurrently, so answer by system ID rather than call order
+        self.mock_esi.side_effect = lambda system_id, etag: changed if system_id == 30000144 else None
+        
+        systems = get_or_fetch_systems([30000142, 30000144])
+        
+        self.mock_esi.assert_any_call(30000142, '"a"')
+        self.mock_esi.assert_any_call(30000144, '"b"')
+        self.assertEqual(systems[30000142]["x"], 1.0)
+        self.assertEqual(systems[30000144]["x"], 7.0)
+        self.assertGreater(self.db.get_system(30000142)["last_update"], 0)
+        self.assertEqual(self.db.get_system(30000144)["etag"], '"c"')
+    
+    def test_stale_system_served_when_esi_unavailable(self):
+        """Test that stored data is used, and not retried at once, if a stale system can't be revalidated."""
+        self.db.insert_system(30000142, "Jita", 1.0, 2.0, 3.0, etag='"a"')
+        self._expire_stored_systems()
+        self.mock_esi.side_effect = RuntimeError("ESI down")
+        
+        system = get_or_fetch_system(30000142)
+        get_or_fetch_system(30000142)
+        _cached_system.cache_clear()
+        get_or_fetch_system(30000142)
+        get_or_fetch_systems([30000142])
+        
+        self.mock_esi.assert_called_once()
+        self.assertEqual(system, {"system_id": 30000142, "name": "Jita", "x": 1.0, "y": 2.0, "z": 3.0})
+        retry_at = self.db.get_system(30000142)["last_update"] + SYSTEM_REFRESH_SECONDS
+        self.assertAlmostEqual(retry_at, time.time() + SYSTEM_RETRY_SECONDS, delta=5)
+    
+    def test_stale_batch_keeps_successes_when_one_fails(self):
+        """Test that one failed revalidation doesn't discard the others in the batch."""
+        self.db.insert_system(30000142, "Jita", 1.0, 2.0, 3.0, etag='"a"')
+        self.db.insert_system(30000144, "Perimeter", 4.0, 5.0, 6.0, etag='"b"')
+        self._expire_stored_systems()
+        
+        def respond(system_id, etag):
+            if system_id == 30000144:
+                raise ValueError("System 30000144 not found")
+            return None
+        self.mock_esi.side_effect = respond
+        
+        systems = get_or_fetch_systems([30000142, 30000144])
+        get_or_fetch_systems([30000142, 30000144])
+        
+        self.assertEqual(self.mock_esi.call_count, 2)
+        self.assertEqual(systems[30000144]["x"], 4.0)
+        self.assertGreater(self.db.get_system(30000142)["last_update"], time.time() - 5)
+        self.assertGreater(self.db.get_system(30000144)["last_update"], 0)
+    
+    def test_cached_system_revalidated_once_stale(self):
+        """Test that a cached lookup is revalidated once its stored data goes stale."""
+        self.db.insert_system(30000142, "Jita", 1.0, 2.0, 3.0, etag='"a"')
+        get_or_fetch_system(30000142)
+        self.mock_esi.return_value = {
+            "system_id": 30000142, "name": "Jita", "x": 7.0, "y": 8.0, "z": 9.0, "etag": '"b"'
+        }
+        
+        with patch('app.SYSTEM_REFRESH_SECONDS', -1):
+            system = get_or_fetch_system(30000142)
+        
+        self.mock_esi.assert_called_once_with(30000142, '"a"')
+        self.assertEqual(system["x"], 7.0)
+        self.assertEqual(get_or_fetch_system(30000142)["x"], 7.0)
+    
+    def test_batch_refresh_updates_cached_system(self):
+        """Test that revalidating through the batch lookup replaces cached single lookups."""
+        self.db.insert_system(30000142, "Jita", 1.0, 2.0, 3.0, etag='"a"')
+        get_or_fetch_system(30000142)
+        self.mock_esi.return_value = {
+            "system_id": 30000142, "name": "Jita", "x": 7.0, "y": 8.0, "z": 9.0, "etag": '"b"'
+        }
+        
+        # Once the refresh period has passed the batch lookup revalidates it
+        with patch('time.time', return_value=time.time() + SYSTEM_REFRESH_SECONDS + 60):
+            get_or_fetch_systems([30000142])
+            system = get_or_fetch_system(30000142)
+        
+        self.mock_esi.assert_called_once()
+        self.assertEqual(system["x"], 7.0)
 
 
 if __name__ == "__main__":
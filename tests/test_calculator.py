@@ -3,12 +3,13 @@
 import unittest
 import sys
 import os
+import numpy as np
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from calculator import calculate_distance
-from config import LIGHTYEAR_IN_METERS
+from calculator import calculate_distance, calculate_distances_bulk
+from config import LIGHTYEAR_IN_METERS, INV_LIGHTYEAR_IN_METERS
 
 
 class TestCalculator(unittest.TestCase):
@@ -64,12 +65,13 @@ class TestCalculator(unittest.TestCase):
         
         result = calculate_distance(system1, system2)
         
-        self.assertAlmostEqual(result["distance_meters"], 13.0, places=10)
+        self.assertEqual(result["distance_meters"], 13.0)
     
     def test_lightyear_constant(self):
         """Verify the EVE Online lightyear constant is correct."""
         # Should be 9.46 × 10^15 as per EVE documentation
         self.assertEqual(LIGHTYEAR_IN_METERS, 9460000000000000.0)
+        self.assertEqual(LIGHTYEAR_IN_METERS * INV_LIGHTYEAR_IN_METERS, 1.0)
     
     def test_distance_conversion_accuracy(self):
         """Test that lightyear conversion is accurate."""
@@ -79,6 +81,48 @@ class TestCalculator(unittest.TestCase):
         result = calculate_distance(system1, system2)
         
         self.assertEqual(result["distance_lightyears"], 5.0)
+    
+    def test_calculate_distances_bulk_matches_scalar(self):
+        """Test that bulk calculation matches the single pair calculation."""
+        origins = np.array([
+            [0.0, 0.0, 0.0],
+            [-1000.0, -2000.0, -3000.0],
+            [-129400292875304960.0, 61596815791300400.0, 1720986748719556600.0]
+        ])
+        targets = np.array([
+            [3.0, 4.0, 12.0],
+            [1000.0, 2000.0, 3000.0],
+            [-129524275563970560.0, 61576851935436800.0, 1721076251935088640.0]
+        ])
+        
+        meters, lightyears = calculate_distances_bulk(origins, targets)
+        
+        self.assertEqual(meters.shape, (3,))
+        for i in range(3):
+            expected = calculate_distance(
+                dict(zip("xyz", origins[i])), dict(zip("xyz", targets[i]))
+            )
+            self.assertAlmostEqual(meters[i], expected["distance_meters"], delta=expected["distance_meters"] * 1e-12)
+            self.assertAlmostEqual(lightyears[i], expected["distance_lightyears"], delta=expected["distance_lightyears"] * 1e-12)
+    
+    def test_calculate_distances_bulk_lightyears(self):
+        """Test bulk lightyear conversion and zero distance."""
+        origins = np.zeros((2, 3))
+        targets = np.array([[LIGHTYEAR_IN_METERS * 5, 0.0, 0.0], [0.0, 0.0, 0.0]])
+        
+        meters, lightyears = calculate_distances_bulk(origins, targets)
+        
+        self.assertEqual(lightyears.tolist(), [5.0, 0.0])
+        self.assertEqual(meters[1], 0.0)
+    
+    def test_calculate_distances_bulk_single_origin(self):
+        """Test that a single origin is measured against every target."""
+        origin = np.array([1.0, 2.0, 3.0])
+        targets = np.array([[4.0, 6.0, 3.0], [1.0, 2.0, 3.0], [1.0, 2.0, 16.0]])
+        
+        meters, _ = calculate_distances_bulk(origin, targets)
+        
+        self.assertEqual(meters.tolist(), [5.0, 0.0, 13.0])
 
 
 if __name__ == "__main__":
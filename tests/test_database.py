@@ -0,0 +1,233 @@
+"""Unit tests for the database module."""
+
+import unittest
+import sys
+import os
+import sqlite3
+import tempfile
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tests.support  # noqa: F401  points DATABASE_PATH at a temporary database
+from database import Database, SystemIndex, SQLITE_MAX_VARIABLES
+
+
+class TestDatabase(unittest.TestCase):
+    """Test cases for database operations."""
+    
+    def setUp(self):
+        """Set up a fresh database file for each test."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "test.db")
+        self.db = Database(self.db_path)
+    
+    def tearDown(self):
+        """Close the database and remove the file."""
+        self.db.close()
+        self.tmp_dir.cleanup()
+    
+    def test_insert_and_get_system(self):
+        """Test that an inserted system can be read back."""
+        inserted = self.db.insert_system(30000142, "Jita", 1.0, 2.0, 3.0)
+        
+        system = self.db.get_system(30000142)
+        
+        self.assertEqual(inserted, dict(system))
+        self.assertEqual(system["name"], "Jita")
+        self.assertEqual((system["x"], system["y"], system["z"]), (1.0, 2.0, 3.0))
+        self.assertIsInstance(system["added"], int)
+        self.assertIsInstance(system["last_update"], int)
+        self.assertIsNone(self.db.get_system(30000144))
+    
+    def test_get_systems_more_than_parameter_limit(self):
+        """Test batched lookup of more IDs than fit in one statement."""
+        count = SQLITE_MAX_VARIABLES + 10
+        self.db.insert_systems([
+            {"system_id": 30000000 + i, "name": f"System {i}", "x": float(i), "y": 0.0, "z": 0.0}
+            for i in range(count)
+        ])
+        
+        systems = self.db.get_systems(range(30000000, 30000000 + count + 5))
+        
+        self.assertEqual(len(systems), count)
+        self.assertEqual(systems[30000000 + count - 1]["x"], float(count - 1))
+    
+    def test_insert_systems_ignores_existing(self):
+        """Test that batch insert leaves existing rows untouched."""
+        self.db.insert_system(30000142, "Jita", 1.0, 2.0, 3.0)
+        
+        self.db.insert_systems([
+            {"system_id": 30000142, "name": "Renamed", "x": 9.0, "y": 9.0, "z": 9.0},
+            {"system_id": 30000144, "name": "Perimeter", "x": 4.0, "y": 5.0, "z": 6.0}
+        ])
+        
+        self.assertEqual(self.db.get_system(30000142)["name"], "Jita")
+        self.assertEqual(self.db.get_system(30000144)["name"], "Perimeter")
+    
+    def test_migrates_iso_timestamps(self):
+        """Test that ISO-8601 timestamps from older databases become epoch seconds."""
+        self.db.close()
+        os.remove(self.db_path)
+        
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE systems (
+                system_id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                x REAL NOT NULL,
+                y REAL NOT NULL,
+                z REAL NOT NULL,
+                added TIMESTAMP NOT NULL,
+                last_update TIMESTAMP NOT NULL
+            )
+        """)
+        conn.execute(
+            "INSERT INTO systems VALUES (30000142, 'Jita', 1.0, 2.0, 3.0, ?, ?)",
+            ("2026-02-20T00:00:00", "2026-02-20T01:02:03.123456")
+        )
+        conn.commit()
+        conn.close()
+        
+        self.db = Database(self.db_path)
+        system = self.db.get_system(30000142)
+        
+        self.assertEqual(system["added"], 1771545600)
+        self.assertEqual(system["last_update"], 1771549323)
+    
+    def test_system_id_is_rowid_alias(self):
+        """Test that lookups by system_id search the table's own B-tree."""
+        conn = self.db.get_connection()
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM systems WHERE system_id = ?", (30000142,)
+        ).fetchall()
+        indexes = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'systems'"
+        ).fetchall()
+        
+        self.assertIn("USING INTEGER PRIMARY KEY", plan[0]["detail"])
+        self.assertEqual(indexes, [])
+    
+    def test_index_loaded_on_startup(self):
+        """Test that stored systems are loaded into the index on startup."""
+        self.db.insert_system(30000142, "Jita", 1.0, 2.0, 3.0)
+        self.db.close()
+        
+        reopened = Database(self.db_path)
+        
+        self.assertEqual(len(reopened.index), 1)
+        self.assertEqual(
+            reopened.index.get(30000142),
+            {"system_id": 30000142, "name": "Jita", "x": 1.0, "y": 2.0, "z": 3.0,
+             "last_update": self.db.get_system(30000142)["last_update"]}
+        )
+        reopened.close()
+    
+    def test_index_updated_on_insert(self):
+        """Test that inserts are reflected in the index."""
+        self.db.insert_system(30000142, "Jita", 1.0, 2.0, 3.0)
+        self.db.insert_systems([
+            {"system_id": 30000144, "name": "Perimeter", "x": 4.0, "y": 5.0, "z": 6.0}
+        ])
+        
+        systems = self.db.index.get_many([30000142, 30000144, 30000145])
+        
+        self.assertEqual(sorted(systems), [30000142, 30000144])
+        self.assertEqual(systems[30000144]["name"], "Perimeter")
+    
+    def test_migration_adds_etag_column(self):
+        """Test that databases from before ETags were stored gain the column."""
+        self.db.close()
+        os.remove(self.db_path)
+        
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE systems (
+                system_id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                x REAL NOT NULL,
+                y REAL NOT NULL,
+                z REAL NOT NULL,
+                added INTEGER NOT NULL,
+                last_update INTEGER NOT NULL
+            )
+        """)
+        conn.execute("INSERT INTO systems VALUES (30000142, 'Jita', 1.0, 2.0, 3.0, 0, 0)")
+        conn.execute("PRAGMA user_version = 1")
+        conn.commit()
+        conn.close()
+        
+        self.db = Database(self.db_path)
+        
+        self.assertIsNone(self.db.get_system(30000142)["etag"])
+    
+    def test_insert_existing_system_returns_stored_row(self):
+        """Test that inserting a system that already exists returns the stored row."""
+        first = self.db.insert_system(30000142, "Jita", 1.0, 2.0, 3.0, etag='"a"')
+        
+        second = self.db.insert_system(30000142, "Jita", 7.0, 8.0, 9.0, etag='"b"')
+        
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.db.index), 1)
+    
+    def test_refresh_systems(self):
+        """Test that revalidated systems get a new timestamp and changed data."""
+        self.db.insert_systems([
+            {"system_id": 30000142, "name": "Jita", "x": 1.0, "y": 2.0, "z": 3.0, "etag": '"a"'},
+            {"system_id": 30000144, "name": "Perimeter", "x": 4.0, "y": 5.0, "z": 6.0, "etag": '"b"'}
+        ])
+        self.db.get_connection().execute("UPDATE systems SET last_update = 0")
+        
+        refreshed = self.db.refresh_systems(
+            [{"system_id": 30000142, "name": "Jita", "x": 7.0, "y": 8.0, "z": 9.0, "etag": '"c"'}],
+            [30000144]
+        )
+        
+        jita = self.db.get_system(30000142)
+        perimeter = self.db.get_system(30000144)
+        self.assertEqual((jita["x"], jita["etag"]), (7.0, '"c"'))
+        self.assertEqual((perimeter["x"], perimeter["etag"]), (4.0, '"b"'))
+        self.assertGreater(jita["last_update"], 0)
+        self.assertGreater(perimeter["last_update"], 0)
+        self.assertEqual(self.db.index.get(30000142)["x"], 7.0)
+        self.assertEqual(self.db.index.get(30000144)["last_update"], perimeter["last_update"])
+        self.assertEqual({s["system_id"] for s in refreshed}, {30000142, 30000144})
+    
+    def test_set_last_update(self):
+        """Test that last_update is set in the database and the index."""
+        self.db.insert_system(30000142, "Jita", 1.0, 2.0, 3.0)
+        
+        updated = self.db.set_last_update([30000142], 12345)
+        
+        self.assertEqual(self.db.get_system(30000142)["last_update"], 12345)
+        self.assertEqual(self.db.index.get(30000142)["last_update"], 12345)
+        self.assertEqual([s["system_id"] for s in updated], [30000142])
+
+
+class TestSystemIndex(unittest.TestCase):
+    """Test cases for the in-memory system index."""
+    
+    def test_add_grows_storage(self):
+        """Test that the index keeps every row as it grows."""
+        index = SystemIndex()
+        for i in range(100):
+            index.add([{"system_id": 30000000 + i, "name": str(i), "x": float(i), "y": 0.0, "z": 0.0,
+                        "last_update": 0}])
+        
+        self.assertEqual(len(index), 100)
+        self.assertEqual(index.get(30000000)["x"], 0.0)
+        self.assertEqual(index.get(30000099)["x"], 99.0)
+        self.assertEqual(index.xyz[index.rows[30000050]].tolist(), [50.0, 0.0, 0.0])
+    
+    def test_add_skips_duplicates(self):
+        """Test that adding a known system keeps the original entry."""
+        index = SystemIndex()
+        index.add([{"system_id": 30000142, "name": "Jita", "x": 1.0, "y": 2.0, "z": 3.0, "last_update": 0}])
+        index.add([{"system_id": 30000142, "name": "Renamed", "x": 9.0, "y": 9.0, "z": 9.0, "last_update": 0}])
+        
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.get(30000142)["name"], "Jita")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 """Integration tests for the ESI client."""
 
+import threading
 import unittest
 import sys
 import os
@@ -10,17 +11,28 @@ import requests
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from esi_client import ESIClient
-from config import ESI_BASE_URL, ESI_COMPATIBILITY_DATE, ESI_USER_AGENT
+from config import ESI_BASE_URL, ESI_COMPATIBILITY_DATE, ESI_USER_AGENT, ESI_MAX_WORKERS
+
+JITA_URL = f"{ESI_BASE_URL}/universe/systems/30000142/"
+
+
+def _mock_http_error(status_code):
+    """Build a mock response whose raise_for_status raises an HTTPError."""
+    mock_response = Mock(status_code=status_code)
+    mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(response=mock_response)
+    return mock_response
 
 
 class TestESIClient(unittest.TestCase):
     """Test cases for ESI API client."""
     
-    def setUp(self):
-        """Set up test fixtures."""
-        self.client = ESIClient()
-        self.test_system_id = 30000142
-        self.mock_response_data = {
+    @classmethod
+    def setUpClass(cls):
+        """Set up test fixtures shared by every test."""
+        # Neither the client nor the response data is modified by any test
+        cls.client = ESIClient()
+        cls.test_system_id = 30000142
+        cls.mock_response_data = {
             "system_id": 30000142,
             "name": "Jita",
             "position": {
@@ -31,6 +43,19 @@ class TestESIClient(unittest.TestCase):
             "constellation_id": 20000020,
             "star_id": 40009077
         }
+        
+        # Stub out HTTP once for the class; setUp clears it between tests
+        cls.session_patcher = patch.object(cls.client.session, "get")
+        cls.mock_get = cls.session_patcher.start()
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Restore the real HTTP session."""
+        cls.session_patcher.stop()
+    
+    def setUp(self):
+        """Clear responses and calls left by the previous test."""
+        self.mock_get.reset_mock(return_value=True, side_effect=True)
     
     def test_client_initialization(self):
         """Test that client initializes with correct headers."""
@@ -38,19 +63,18 @@ class TestESIClient(unittest.TestCase):
         self.assertEqual(self.client.headers["X-Compatibility-Date"], ESI_COMPATIBILITY_DATE)
         self.assertEqual(self.client.headers["user-agent"], ESI_USER_AGENT)
     
-    @patch('esi_client.requests.get')
-    def test_get_system_info_success(self, mock_get):
+    def test_get_system_info_success(self):
         """Test successful system info retrieval."""
         mock_response = Mock()
         mock_response.status_code = 200
         mock_response.json.return_value = self.mock_response_data
-        mock_get.return_value = mock_response
+        mock_response.headers = {"ETag": '"abc123"'}
+        self.mock_get.return_value = mock_response
         
         result = self.client.get_system_info(self.test_system_id)
         
         # Verify request was made correctly
-        expected_url = f"{ESI_BASE_URL}/universe/systems/{self.test_system_id}/"
-        mock_get.assert_called_once_with(expected_url, headers=self.client.headers, timeout=10)
+        self.mock_get.assert_called_once_with(JITA_URL, headers=self.client.headers, timeout=10)
         
         # Verify response format
         self.assertEqual(result["system_id"], 30000142)
@@ -58,67 +82,69 @@ class TestESIClient(unittest.TestCase):
         self.assertIn("x", result)
         self.assertIn("y", result)
         self.assertIn("z", result)
-        self.assertEqual(len(result), 5)  # Only 5 fields should be returned
+        self.assertEqual(result["etag"], '"abc123"')
+        self.assertEqual(len(result), 6)  # Only 6 fields should be returned
     
-    @patch('esi_client.requests.get')
-    def test_get_system_info_404_not_found(self, mock_get):
-        """Test handling of system not found (404 error)."""
+    def test_get_system_info_not_modified(self):
+        """Test that a 304 response to a conditional request returns None."""
         mock_response = Mock()
-        mock_response.status_code = 404
-        mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(response=mock_response)
-        mock_get.return_value = mock_response
+        mock_response.status_code = 304
+        self.mock_get.return_value = mock_response
+        
+        result = self.client.get_system_info(self.test_system_id, etag='"abc123"')
+        
+        self.assertIsNone(result)
+        headers = self.mock_get.call_args.kwargs["headers"]
+        self.assertEqual(headers["If-None-Match"], '"abc123"')
+        self.assertNotIn("If-None-Match", self.client.headers)
+    
+    def test_get_system_info_404_not_found(self):
+        """Test handling of system not found (404 error)."""
+        self.mock_get.return_value = _mock_http_error(404)
         
         with self.assertRaises(ValueError) as context:
             self.client.get_system_info(99999999)
         
         self.assertIn("not found", str(context.exception).lower())
     
-    @patch('esi_client.requests.get')
-    def test_get_system_info_500_server_error(self, mock_get):
+    def test_get_system_info_500_server_error(self):
         """Test handling of ESI server error (500)."""
-        mock_response = Mock()
-        mock_response.status_code = 500
-        mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(response=mock_response)
-        mock_get.return_value = mock_response
+        self.mock_get.return_value = _mock_http_error(500)
         
         with self.assertRaises(requests.exceptions.HTTPError):
             self.client.get_system_info(self.test_system_id)
     
-    @patch('esi_client.requests.get')
-    def test_get_system_info_timeout(self, mock_get):
+    def test_get_system_info_timeout(self):
         """Test handling of request timeout."""
-        mock_get.side_effect = requests.exceptions.Timeout("Connection timeout")
+        self.mock_get.side_effect = requests.exceptions.Timeout("Connection timeout")
         
         with self.assertRaises(RuntimeError) as context:
             self.client.get_system_info(self.test_system_id)
         
         self.assertIn("Failed to fetch", str(context.exception))
     
-    @patch('esi_client.requests.get')
-    def test_get_system_info_connection_error(self, mock_get):
+    def test_get_system_info_connection_error(self):
         """Test handling of connection errors."""
-        mock_get.side_effect = requests.exceptions.ConnectionError("Network unreachable")
+        self.mock_get.side_effect = requests.exceptions.ConnectionError("Network unreachable")
         
         with self.assertRaises(RuntimeError) as context:
             self.client.get_system_info(self.test_system_id)
         
         self.assertIn("Failed to fetch", str(context.exception))
     
-    @patch('esi_client.requests.get')
-    def test_get_system_info_invalid_json(self, mock_get):
+    def test_get_system_info_invalid_json(self):
         """Test handling of invalid JSON response."""
         mock_response = Mock()
         mock_response.status_code = 200
         mock_response.json.side_effect = ValueError("Invalid JSON")
-        mock_get.return_value = mock_response
+        self.mock_get.return_value = mock_response
         
         with self.assertRaises(RuntimeError) as context:
             self.client.get_system_info(self.test_system_id)
         
         self.assertIn("Invalid response format", str(context.exception))
     
-    @patch('esi_client.requests.get')
-    def test_get_system_info_missing_fields(self, mock_get):
+    def test_get_system_info_missing_fields(self):
         """Test handling of response with missing required fields."""
         mock_response = Mock()
         mock_response.status_code = 200
@@ -127,25 +153,24 @@ class TestESIClient(unittest.TestCase):
             "system_id": 30000142,
             "name": "Jita"
         }
-        mock_get.return_value = mock_response
+        self.mock_get.return_value = mock_response
         
         with self.assertRaises(RuntimeError) as context:
             self.client.get_system_info(self.test_system_id)
         
         self.assertIn("Invalid response format", str(context.exception))
     
-    @patch('esi_client.requests.get')
-    def test_headers_sent_correctly(self, mock_get):
+    def test_headers_sent_correctly(self):
         """Test that all required headers are sent."""
         mock_response = Mock()
         mock_response.status_code = 200
         mock_response.json.return_value = self.mock_response_data
-        mock_get.return_value = mock_response
+        self.mock_get.return_value = mock_response
         
         self.client.get_system_info(self.test_system_id)
         
         # Get the call arguments
-        call_args = mock_get.call_args
+        call_args = self.mock_get.call_args
         headers = call_args[1]['headers']
         
         # Verify all required headers present
@@ -153,6 +178,88 @@ class TestESIClient(unittest.TestCase):
         self.assertIn("user-agent", headers)
         self.assertEqual(headers["X-Compatibility-Date"], "2026-02-02")
         self.assertIn("WizardLightYearsCalculator", headers["user-agent"])
+    
+    def test_get_systems_info_preserves_order(self):
+        """Test that concurrent fetches return results in request order."""
+        def respond(url, headers, timeout):
+            system_id = int(url.rstrip("/").rsplit("/", 1)[1])
+            mock_response = Mock()
+            mock_response.json.return_value = dict(self.mock_response_data, system_id=system_id)
+            return mock_response
+        self.mock_get.side_effect = respond
+        
+        system_ids = [30000142 + i for i in range(20)]
+        results = self.client.get_systems_info(system_ids)
+        
+        self.assertEqual([r["system_id"] for r in results], system_ids)
+        self.assertEqual(self.mock_get.call_count, 20)
+    
+    def test_get_systems_info_not_found(self):
+        """Test that a missing system fails the whole batch."""
+        self.mock_get.return_value = _mock_http_error(404)
+        
+        with self.assertRaises(ValueError):
+            self.client.get_systems_info([30000142, 30000144])
+    
+    def test_get_systems_info_return_exceptions(self):
+        """Test that failures can be returned per system instead of failing the batch."""
+        def respond(url, headers, timeout):
+            if url == JITA_URL:
+                return _mock_http_error(404)
+            mock_response = Mock()
+            mock_response.json.return_value = dict(self.mock_response_data, system_id=30000144)
+            return mock_response
+        self.mock_get.side_effect = respond
+        
+        results = self.client.get_systems_info([30000142, 30000144], return_exceptions=True)
+        
+        self.assertIsInstance(results[0], ValueError)
+        self.assertEqual(results[1]["system_id"], 30000144)
+    
+    def test_get_systems_info_cancels_pending_on_failure(self):
+        """Test that queued fetches are dropped once one system fails."""
+        release = threading.Event()
+        
+        def respond(url, headers, timeout):
+            if url == JITA_URL:
+                return _mock_http_error(404)
+            # Keep the other workers busy until the batch has failed
+            release.wait(5)
+            return _mock_http_error(404)
+        self.mock_get.side_effect = respond
+        
+        try:
+            with self.assertRaises(ValueError):
+                self.client.get_systems_info([30000142 + i for i in range(100)])
+        finally:
+            release.set()
+        
+        # The failed fetch plus at most one in flight per worker
+        self.assertLessEqual(self.mock_get.call_count, ESI_MAX_WORKERS + 1)
+    
+    def test_get_systems_info_cancels_pending_on_later_failure(self):
+        """Test that a failure is acted on while an earlier fetch is still running."""
+        release = threading.Event()
+        failing_url = f"{ESI_BASE_URL}/universe/systems/30000143/"
+        
+        def respond(url, headers, timeout):
+            if url == failing_url:
+                return _mock_http_error(404)
+            # Keep every other fetch, including the first, in flight until
+            # the batch has failed
+            release.wait(5)
+            return _mock_http_error(404)
+        self.mock_get.side_effect = respond
+        
+        try:
+            with self.assertRaises(ValueError):
+                self.client.get_systems_info([30000142 + i for i in range(100)])
+            calls = self.mock_get.call_count
+        finally:
+            release.set()
+        
+        # The failed fetch plus at most one in flight per worker
+        self.assertLessEqual(calls, ESI_MAX_WORKERS + 1)
 
 
 if __name__ == "__main__":
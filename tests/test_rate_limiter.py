@@ -0,0 +1,117 @@
+"""Unit tests for the token bucket rate limiter."""
+
+import unittest
+import sys
+import os
+from unittest.mock import patch
+from flask import Flask
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rate_limiter import TokenBucketLimiter, limit_per_client
+
+
+class TestTokenBucketLimiter(unittest.TestCase):
+    """Test cases for the token bucket."""
+    
+    @patch('rate_limiter.time.monotonic', return_value=1000.0)
+    def test_allows_burst_then_rejects(self, mock_time):
+        """Test that a client may spend its full bucket and no more."""
+        limiter = TokenBucketLimiter(rate=3)
+        
+        results = [limiter.allow("10.0.0.1") for _ in range(4)]
+        
+        self.assertEqual(results, [True, True, True, False])
+    
+    @patch('rate_limiter.time.monotonic')
+    def test_refills_over_time(self, mock_time):
+        """Test that tokens refill at the per-minute rate."""
+        limiter = TokenBucketLimiter(rate=60)
+        mock_time.return_value = 1000.0
+        for _ in range(60):
+            limiter.allow("10.0.0.1")
+        self.assertFalse(limiter.allow("10.0.0.1"))
+        
+        # One token per second at 60 per minute
+        mock_time.return_value = 1001.0
+        self.assertTrue(limiter.allow("10.0.0.1"))
+        self.assertFalse(limiter.allow("10.0.0.1"))
+    
+    @patch('rate_limiter.time.monotonic')
+    def test_refills_over_period(self, mock_time):
+        """Test that tokens refill over a custom period."""
+        limiter = TokenBucketLimiter(rate=2, period=3600.0)
+        mock_time.return_value = 1000.0
+        limiter.allow("10.0.0.1")
+        limiter.allow("10.0.0.1")
+        
+        # One token every half hour at 2 per hour
+        mock_time.return_value = 1000.0 + 1799.0
+        self.assertFalse(limiter.allow("10.0.0.1"))
+        mock_time.return_value = 1000.0 + 1800.0
+        self.assertTrue(limiter.allow("10.0.0.1"))
+    
+    @patch('rate_limiter.time.monotonic', return_value=1000.0)
+    def test_clients_are_independent(self, mock_time):
+        """Test that one client's usage doesn't affect another."""
+        limiter = TokenBucketLimiter(rate=1)
+        
+        self.assertTrue(limiter.allow("10.0.0.1"))
+        self.assertFalse(limiter.allow("10.0.0.1"))
+        self.assertTrue(limiter.allow("10.0.0.2"))
+    
+    @patch('rate_limiter.time.monotonic', return_value=1000.0)
+    def test_evicts_least_recently_seen(self, mock_time):
+        """Test that the number of tracked clients is bounded."""
+        limiter = TokenBucketLimiter(rate=1, max_clients=2)
+        
+        for client in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+            limiter.allow(client)
+        
+        self.assertEqual(list(limiter._buckets), ["10.0.0.2", "10.0.0.3"])
+
+
+class TestLimitPerClient(unittest.TestCase):
+    """Test cases for the view decorator."""
+    
+    def setUp(self):
+        """Set up a minimal app with limited views."""
+        self.app = Flask(__name__)
+        
+        @self.app.route("/limited")
+        @limit_per_client(2)
+        def limited():
+            return "ok"
+        
+        @self.app.route("/hourly")
+        @limit_per_client(5, 3)
+        def hourly():
+            return "ok"
+        
+        self.client = self.app.test_client()
+    
+    def test_returns_429_when_exceeded(self):
+        """Test that requests over the limit are rejected with 429."""
+        statuses = [self.client.get("/limited").status_code for _ in range(3)]
+        
+        self.assertEqual(statuses, [200, 200, 429])
+    
+    def test_hourly_limit(self):
+        """Test that the hourly limit applies alongside the per-minute one."""
+        responses = [self.client.get("/hourly") for _ in range(4)]
+        
+        self.assertEqual([r.status_code for r in responses], [200, 200, 200, 429])
+        self.assertIn("3 per 1 hour", responses[-1].get_data(as_text=True))
+    
+    def test_disabled_by_config(self):
+        """Test that limiting is skipped when RATE_LIMIT_ENABLED is false."""
+        self.app.config["RATE_LIMIT_ENABLED"] = False
+        
+        statuses = [self.client.get("/limited").status_code for _ in range(3)]
+        
+        self.assertEqual(statuses, [200, 200, 200])
+
+
+if __name__ == "__main__":
+    unittest.main()